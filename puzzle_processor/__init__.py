@@ -1,6 +1,6 @@
 
 from .core import PuzzleProcessor
 from .geometry import extend_line
-from .exporter import write_stl
+from .exporter import StlWriter, write_stl
 
-__all__ = ["PuzzleProcessor", "extend_line", "write_stl"]
+__all__ = ["PuzzleProcessor", "extend_line", "StlWriter", "write_stl"]
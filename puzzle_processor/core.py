@@ -1,19 +1,180 @@
 
+import hashlib
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import numpy as np
+import shapely
 from types import SimpleNamespace
 from svgpathtools import svg2paths
-from shapely.geometry import LineString
+from shapely import wkb as shapely_wkb
+from shapely.geometry import Point
 from shapely.ops import polygonize, unary_union, triangulate
+from shapely.prepared import prep
+
+try:
+    import mapbox_earcut as earcut
+except ImportError:
+    earcut = None
+
+try:
+    from diskcache import Cache
+except ImportError:
+    Cache = None
 
-from .geometry import extend_line
-from .exporter import write_stl
+from .geometry import build_linestrings
+from .exporter import StlWriter
 
 # Default Parameters
 DEFAULT_THICKNESS = 3.0 # mm
 DEFAULT_TOLERANCE = -0.2 # mm (negative buffer to create gap)
 DEFAULT_DENSITY = 0.5 # units per sample (mm)
 EXTENSION_DIST = 1.0 # mm to extend cut lines to ensure intersection
+MIN_PARALLEL_PIECES = 16 # below this, process-pool overhead outweighs the win
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "puzzle_cache")
+# Bump whenever discretization/noding/polygonization changes output, so
+# persisted pieces from older installs are not silently reused
+_CACHE_VERSION = 1
+
+_piece_cache = None
+
+def _get_piece_cache():
+    """
+    Lazily opens the on-disk piece cache (None when diskcache is missing or
+    the cache directory cannot be created). The polygonized pieces depend
+    only on the SVG content and density, so re-renders with different
+    thickness/tolerance can skip the whole discretize/node/polygonize phase.
+    """
+    global _piece_cache
+    if _piece_cache is None and Cache is not None:
+        try:
+            _piece_cache = Cache(CACHE_DIR)
+        except Exception:
+            pass
+    return _piece_cache
+
+# Shapely 2.x vectorized point-in-polygon predicate
+_HAS_CONTAINS_XY = hasattr(shapely, "contains_xy")
+
+def _filter_interior(piece, tri_xy):
+    """
+    Keeps the triangles of tri_xy (T, 3, 2) whose centroid lies inside piece.
+    Uses one vectorized contains_xy call on Shapely 2.x so the predicate
+    dispatch into GEOS is amortized over all triangles; falls back to a
+    prepared-geometry loop on older versions.
+    """
+    centroids = tri_xy.mean(axis=1)
+    if _HAS_CONTAINS_XY:
+        mask = shapely.contains_xy(piece, centroids[:, 0], centroids[:, 1])
+    else:
+        prepared = prep(piece)
+        mask = np.fromiter((prepared.contains(Point(cx, cy)) for cx, cy in centroids),
+                           dtype=bool, count=len(centroids))
+    return tri_xy[mask]
+
+def _triangulate_piece(piece):
+    """
+    Triangulates a polygon (with holes) into a (K, 3, 2) vertex array.
+
+    With mapbox_earcut installed the polygon is triangulated directly (holes
+    included) in linear time. Otherwise falls back to shapely's unconstrained
+    Delaunay triangulation, discarding triangles outside the piece — which
+    wastes work on concave pieces but needs no extra dependency.
+    """
+    if earcut is not None:
+        verts = np.asarray(piece.exterior.coords[:-1], dtype=np.float64)
+        rings = [len(verts)]
+        for hole in piece.interiors:
+            verts = np.vstack([verts, np.asarray(hole.coords[:-1], dtype=np.float64)])
+            rings.append(len(verts))
+        rings = np.asarray(rings, dtype=np.uint32)
+        idx = earcut.triangulate_float64(verts, rings).reshape(-1, 3)
+        tri_xy = verts[idx]
+        # Enforce CCW winding so top faces point up regardless of ring order
+        # (2-D cross spelled out by hand: np.cross on 2-D vectors is
+        # deprecated since NumPy 2.0)
+        e1 = tri_xy[:, 1] - tri_xy[:, 0]
+        e2 = tri_xy[:, 2] - tri_xy[:, 0]
+        signed = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+        tri_xy[signed < 0] = tri_xy[signed < 0][:, ::-1]
+        return tri_xy
+
+    mesh = triangulate(piece)
+    tri_xy = np.array([list(tri.exterior.coords)[:3] for tri in mesh])  # (T, 3, 2)
+    if len(tri_xy):
+        tri_xy = _filter_interior(piece, tri_xy)
+    return tri_xy
+
+def _extrude_piece(piece, thickness):
+    """
+    Builds the (M, 3, 3) triangle array (top, bottom and side walls) for a
+    single polygon part.
+    """
+    batches = []
+
+    tri_xy = _triangulate_piece(piece)  # (K, 3, 2)
+    if len(tri_xy):
+        z_top = np.full((len(tri_xy), 3, 1), thickness)
+        z_bot = np.zeros((len(tri_xy), 3, 1))
+
+        # Top face (z = THICKNESS) - CCW
+        batches.append(np.concatenate([tri_xy, z_top], axis=2))
+        # Bottom face (z = 0) - CW (to face down)
+        batches.append(np.concatenate([tri_xy[:, [0, 2, 1]], z_bot], axis=2))
+
+    # Side walls: two triangles per boundary edge, built by slicing the
+    # coordinate array instead of a per-edge Python loop
+    boundaries = [piece.exterior] + list(piece.interiors)
+    for boundary in boundaries:
+        coords = np.asarray(boundary.coords, dtype=np.float64)
+        if len(coords) < 2:
+            continue
+        p1 = coords[:-1]
+        p2 = coords[1:]
+        z0 = np.zeros((len(p1), 1))
+        zT = np.full((len(p1), 1), thickness)
+
+        v1 = np.hstack([p1, z0])
+        v2 = np.hstack([p2, z0])
+        v3 = np.hstack([p2, zT])
+        v4 = np.hstack([p1, zT])
+
+        batches.append(np.stack([v1, v2, v3], axis=1))
+        batches.append(np.stack([v1, v3, v4], axis=1))
+
+    return np.concatenate(batches) if batches else np.empty((0, 3, 3))
+
+def _process_piece(poly_wkb, tolerance, thickness):
+    """
+    Worker for per-piece 3D generation: tolerance buffer, triangulation and
+    extrusion for one polygon. Takes/returns only picklable values (WKB in,
+    ndarray out) so it can run in a process pool.
+    """
+    poly = shapely_wkb.loads(poly_wkb)
+
+    # Apply tolerance
+    shrunk_poly = poly.buffer(tolerance)
+
+    # Buffer might return MultiPolygon or empty if piece is too small/invalid
+    if shrunk_poly.is_empty:
+        return np.empty((0, 3, 3))
+
+    target_polys = []
+    if shrunk_poly.geom_type == 'MultiPolygon':
+        target_polys.extend(shrunk_poly.geoms)
+    elif shrunk_poly.geom_type == 'Polygon':
+        target_polys.append(shrunk_poly)
+
+    batches = []
+    for piece in target_polys:
+        try:
+            batches.append(_extrude_piece(piece, thickness))
+        except Exception as e:
+            print(f"Triangulation failed for piece: {e}")
+
+    return np.concatenate(batches) if batches else np.empty((0, 3, 3))
 
 class PuzzleProcessor:
     def __init__(self, input_file, output_file, thickness=DEFAULT_THICKNESS, 
@@ -29,130 +190,85 @@ class PuzzleProcessor:
         if not os.path.exists(svg_path):
             raise FileNotFoundError(f"Error: SVG file not found at {svg_path}")
 
-        print(f"Reading {svg_path}...")
-        try:
-            paths, _ = svg2paths(svg_path)
-        except Exception as e:
-            raise ValueError(f"Error parsing SVG: {e}")
-        
-        lines = []
-        print(f"Discretizing paths with density {self.density}...")
-        
-        for path in paths:
-            # Reimplementing discretization logic inline for now, but could use geometry.discretize_path
-            # The current logic is slightly intertwined with start/end processing
-            current_points = []
-            for segment in path:
-                # Check for discontinuity (Move command or separate subpaths)
-                if current_points:
-                    last_p = complex(current_points[-1][0], current_points[-1][1])
-                    # If start of new segment does not match end of previous, flush line
-                    if abs(segment.start - last_p) > 1e-3:
-                        if len(current_points) > 1:
-                            ls = LineString(current_points)
-                            ls = extend_line(ls, EXTENSION_DIST)
-                            lines.append(ls)
-                        current_points = []
-                
-                length = segment.length()
-                if length < 1e-5:
-                    continue
-                
-                # Sample points along the segment
-                count = max(2, int(length / self.density))
-                
-                # If start of new line, add start point
-                if not current_points:
-                    p = segment.point(0)
-                    current_points.append((round(p.real, 4), round(p.imag, 4)))
-
-                for i in range(1, count + 1):
-                    t = i / count
-                    p = segment.point(t)
-                    current_points.append((round(p.real, 4), round(p.imag, 4)))
-            
-            # Flush path end
-            if len(current_points) > 1:
-                ls = LineString(current_points)
-                ls = extend_line(ls, EXTENSION_DIST)
-                lines.append(ls)
-        
-        print(f"Noding {len(lines)} lines (this may take a moment)...")
-        # unary_union splits lines at intersections, creating a valid planar graph
-        noded_lines = unary_union(lines)
-        if hasattr(noded_lines, "is_empty") and noded_lines.is_empty:
-             raise ValueError("Error: No valid lines found.")
+        # Pieces depend only on (svg content, density) — check the cache
+        # before paying for discretize/node/polygonize
+        cache = _get_piece_cache()
+        cache_key = None
+        polygons = None
+        if cache is not None:
+            with open(svg_path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            cache_key = f"v{_CACHE_VERSION}_{digest}_{self.density}"
+            cached = cache.get(cache_key)
+            if cached is not None:
+                print(f"Reusing {len(cached)} cached pieces for {os.path.basename(svg_path)}...")
+                polygons = [shapely_wkb.loads(b) for b in cached]
+
+        if polygons is None:
+            print(f"Reading {svg_path}...")
+            try:
+                paths, _ = svg2paths(svg_path)
+            except Exception as e:
+                raise ValueError(f"Error parsing SVG: {e}")
+
+            print(f"Discretizing paths with density {self.density}...")
+            lines = build_linestrings(paths, self.density, extension=EXTENSION_DIST)
+
+            # Douglas-Peucker within sampling noise: dense Bezier sampling
+            # leaves many near-collinear vertices, and noding cost grows
+            # superlinearly with vertex count
+            if hasattr(shapely, "simplify"):
+                lines = shapely.simplify(lines, tolerance=self.density * 0.25,
+                                         preserve_topology=False)
+            else:
+                lines = [ls.simplify(self.density * 0.25, preserve_topology=False)
+                         for ls in lines]
+
+            print(f"Noding {len(lines)} lines (this may take a moment)...")
+            # unary_union splits lines at intersections, creating a valid planar
+            # graph; Shapely 2's union_all takes the geometry ndarray from
+            # build_linestrings without per-element type checks
+            if hasattr(shapely, "union_all"):
+                noded_lines = shapely.union_all(lines)
+            else:
+                noded_lines = unary_union(list(lines))
+            if hasattr(noded_lines, "is_empty") and noded_lines.is_empty:
+                 raise ValueError("Error: No valid lines found.")
+
+            print(f"Geometry bounds: {noded_lines.bounds}")
+
+            print("Polygonizing...")
+            polygons = list(polygonize(noded_lines))
+            print(f"Found {len(polygons)} potential pieces.")
+
+            if cache is not None:
+                cache.set(cache_key, [p.wkb for p in polygons])
 
-        print(f"Geometry bounds: {noded_lines.bounds}")
-        
-        print("Polygonizing...")
-        polygons = list(polygonize(noded_lines))
-        print(f"Found {len(polygons)} potential pieces.")
-        
         if len(polygons) <= 1:
             print("Warning: Only found 0 or 1 polygons. Ensure the SVG lines form closed loops.")
             if len(polygons) == 1:
                 print(f"Polygon area: {polygons[0].area}")
             # We don't necessarily raise here to allow inspection/debug
         
-        all_triangles = []
-        
-        print("Generating 3D geometry...")
-        for i, poly in enumerate(polygons):
-            # Apply tolerance
-            shrunk_poly = poly.buffer(self.tolerance)
-            
-            # Buffer might return MultiPolygon or empty if piece is too small/invalid
-            if shrunk_poly.is_empty:
-                continue
-            
-            target_polys = []
-            if shrunk_poly.geom_type == 'MultiPolygon':
-                target_polys.extend(shrunk_poly.geoms)
-            elif shrunk_poly.geom_type == 'Polygon':
-                target_polys.append(shrunk_poly)
-                
-            for piece in target_polys:
-                # Triangulate top/bottom faces
-                try:
-                    mesh = triangulate(piece)
-                except Exception as e:
-                    print(f"Triangulation failed for piece {i}: {e}")
-                    continue
-                
-                for tri in mesh:
-                    # Check if triangle centroid is inside the piece
-                    if piece.contains(tri.centroid):
-                        coords = list(tri.exterior.coords)
-                        v1, v2, v3 = coords[0], coords[1], coords[2]
-                        
-                        # Top face (z = THICKNESS) - CCW
-                        all_triangles.append(((v1[0], v1[1], self.thickness), (v2[0], v2[1], self.thickness), (v3[0], v3[1], self.thickness)))
-                        
-                        # Bottom face (z = 0) - CW (to face down)
-                        all_triangles.append(((v1[0], v1[1], 0), (v3[0], v3[1], 0), (v2[0], v2[1], 0)))
-                
-                # Side walls
-                boundaries = [piece.exterior] + list(piece.interiors)
-                for boundary in boundaries:
-                    coords = list(boundary.coords)
-                    for j in range(len(coords) - 1):
-                        p1 = coords[j]
-                        p2 = coords[j+1]
-                        
-                        # Create two triangles for the vertical face
-                        v1 = (p1[0], p1[1], 0)
-                        v2 = (p2[0], p2[1], 0)
-                        v3 = (p2[0], p2[1], self.thickness)
-                        v4 = (p1[0], p1[1], self.thickness)
-                        
-                        # Triangle 1
-                        all_triangles.append((v1, v2, v3))
-                        # Triangle 2
-                        all_triangles.append((v1, v3, v4))
-
         output_path = os.path.abspath(self.output_file)
-        print(f"Writing {len(all_triangles)} triangles to {output_path}...")
-        write_stl(all_triangles, output_path)
-        print(f"Success! STL file saved to {output_path}")
+        print(f"Generating 3D geometry and streaming to {output_path}...")
+        wkbs = [p.wkb for p in polygons]
+        workers = os.cpu_count() or 1
+        # Stream each piece's triangle batch straight to disk so memory stays
+        # bounded by the largest piece rather than the whole puzzle
+        with StlWriter(output_path) as writer:
+            if len(polygons) >= MIN_PARALLEL_PIECES and workers > 1:
+                # Each piece is independent and CPU-bound in GEOS, so fan out
+                # across processes; WKB keeps the pickling cost per piece low
+                chunksize = max(1, len(polygons) // (4 * workers))
+                with ProcessPoolExecutor(max_workers=workers) as ex:
+                    for batch in ex.map(_process_piece, wkbs,
+                                        repeat(self.tolerance), repeat(self.thickness),
+                                        chunksize=chunksize):
+                        writer.write(batch)
+            else:
+                for poly_wkb in wkbs:
+                    writer.write(_process_piece(poly_wkb, self.tolerance, self.thickness))
+
+        print(f"Success! {writer.count} triangles saved to {output_path}")
 
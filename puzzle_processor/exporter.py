@@ -1,38 +1,126 @@
 
+import mmap
 import struct
 import numpy as np
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Layout of one 50-byte binary STL record: normal, 3 vertices, attribute count
+RECORD_DTYPE = np.dtype([('n', '<3f4'), ('v', '<(3,3)f4'), ('attr', '<u2')])
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _triangle_normals(tris):
+        """Parallel cross-product + normalize kernel over (N, 3, 3) triangles."""
+        out = np.zeros((tris.shape[0], 3), dtype=np.float64)
+        for i in numba.prange(tris.shape[0]):
+            ax = tris[i, 1, 0] - tris[i, 0, 0]
+            ay = tris[i, 1, 1] - tris[i, 0, 1]
+            az = tris[i, 1, 2] - tris[i, 0, 2]
+            bx = tris[i, 2, 0] - tris[i, 0, 0]
+            by = tris[i, 2, 1] - tris[i, 0, 1]
+            bz = tris[i, 2, 2] - tris[i, 0, 2]
+            nx = ay * bz - az * by
+            ny = az * bx - ax * bz
+            nz = ax * by - ay * bx
+            norm = np.sqrt(nx * nx + ny * ny + nz * nz)
+            if norm > 0:
+                out[i, 0] = nx / norm
+                out[i, 1] = ny / norm
+                out[i, 2] = nz / norm
+        return out
+else:
+    _triangle_normals = None
+
+def pack_records(triangles, out=None):
+    """
+    Packs triangles into an array of binary STL records.
+
+    Args:
+        triangles: (N, 3, 3) array-like of triangle vertices
+        out: optional (N,) RECORD_DTYPE array to fill in place (e.g. a view
+             into a memory-mapped output file)
+
+    Returns:
+        (N,) structured ndarray matching RECORD_DTYPE, with per-triangle
+        normals computed in one vectorized pass (degenerate triangles get a
+        zero normal, matching the previous scalar behaviour).
+    """
+    tris = np.ascontiguousarray(triangles, dtype=np.float64).reshape(-1, 3, 3)
+
+    # Normals are computed in float64 (as before) — sliver triangles from the
+    # noding step are degenerate enough that float32 edges skew them visibly
+    if _triangle_normals is not None:
+        normals = _triangle_normals(tris)
+    else:
+        edge1 = tris[:, 1] - tris[:, 0]
+        edge2 = tris[:, 2] - tris[:, 0]
+        normals = np.cross(edge1, edge2)
+        norm = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = np.divide(normals, norm, out=np.zeros_like(normals), where=norm > 0)
+
+    records = np.zeros(len(tris), dtype=RECORD_DTYPE) if out is None else out
+    records['n'] = normals
+    records['v'] = tris
+    return records
+
+class StlWriter:
+    """
+    Incremental binary STL writer.
+
+    Writes the header with a placeholder triangle count up front, appends
+    packed record batches as they arrive, and patches the real count in on
+    close — so memory stays at O(largest batch) instead of O(total
+    triangles). Usable as a context manager.
+    """
+    def __init__(self, filename):
+        # 1 MiB buffer so record batches coalesce into few syscalls
+        self._f = open(filename, 'wb', buffering=1 << 20)
+        self._f.write(b'\0' * 80) # Header
+        self._f.write(struct.pack('<I', 0)) # Patched in close()
+        self.count = 0
+
+    def write(self, triangles):
+        """Appends a batch of triangles ((N, 3, 3) array-like)."""
+        records = pack_records(triangles)
+        if len(records):
+            self._f.write(records.tobytes())
+            self.count += len(records)
+
+    def close(self):
+        self._f.seek(80)
+        self._f.write(struct.pack('<I', self.count))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 def write_stl(triangles, filename):
     """
     Writes a list of triangles to a binary STL file.
-    
+
     Args:
         triangles: List of tuples, where each tuple contains 3 vertices like ((x1,y1,z1), (x2,y2,z2), (x3,y3,z3))
         filename: Output path for the STL file
     """
-    num_triangles = len(triangles)
-    
-    with open(filename, 'wb') as f:
-        f.write(b'\0' * 80) # Header
-        f.write(struct.pack('<I', num_triangles))
-        for t in triangles:
-            # Compute normal
-            v1 = np.array(t[0])
-            v2 = np.array(t[1])
-            v3 = np.array(t[2])
-            edge1 = v2 - v1
-            edge2 = v3 - v1
-            normal = np.cross(edge1, edge2)
-            norm = np.linalg.norm(normal)
-            if norm == 0:
-                normal = np.array([0, 0, 0])
-            else:
-                normal = normal / norm
-            
-            # Write normal
-            f.write(struct.pack('<3f', float(normal[0]), float(normal[1]), float(normal[2])))
-            # Write vertices
-            for v in t:
-                f.write(struct.pack('<3f', float(v[0]), float(v[1]), float(v[2])))
-            # Attribute byte count
-            f.write(struct.pack('<H', 0))
+    tris = np.ascontiguousarray(triangles, dtype=np.float64).reshape(-1, 3, 3)
+    size = 84 + len(tris) * RECORD_DTYPE.itemsize
+
+    # Since the full triangle array is in hand the file size is known up
+    # front: truncate, mmap and pack the records straight into the mapping —
+    # no write() syscalls, the page cache handles persistence
+    with open(filename, 'w+b') as f:
+        f.truncate(size) # zero-filled, which also covers the 80-byte header
+        if not len(tris):
+            return
+        with mmap.mmap(f.fileno(), size) as mm:
+            mm[80:84] = struct.pack('<I', len(tris))
+            out = np.frombuffer(mm, dtype=RECORD_DTYPE, count=len(tris), offset=84)
+            pack_records(tris, out=out)
+            del out # release the buffer reference before the mapping closes
@@ -1,7 +1,20 @@
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
 import numpy as np
+import shapely
 from shapely.geometry import LineString, Polygon
 from shapely.ops import polygonize, unary_union
+from svgpathtools import CubicBezier
+
+# Shapely 2.x exposes bulk constructors that build N geometries in C
+_HAS_BULK_LINESTRINGS = hasattr(shapely, "linestrings")
+
+SNAP_GRID = 1e-3 # mm; vertex grid applied before noding
+MIN_PARALLEL_PATHS = 8 # below this, thread-pool overhead outweighs the win
+MAX_SUBDIVISIONS = 24 # depth cap for adaptive Bezier subdivision
 
 def extend_line(line, dist=1.0):
     """
@@ -33,42 +46,196 @@ def extend_line(line, dist=1.0):
         
     return LineString(coords)
 
+def sample_segment(segment, count):
+    """
+    Evaluates count+1 evenly spaced points along a segment as a (count+1, 2) array.
+    Uses a single vectorized point() call (svgpathtools segments accept numpy
+    arrays of parameters), falling back to scalar evaluation on older versions.
+    """
+    ts = np.linspace(0.0, 1.0, count + 1)
+    try:
+        pts = segment.point(ts)
+    except TypeError:
+        # Older svgpathtools without array support
+        pts = np.array([segment.point(t) for t in ts])
+    return np.column_stack((pts.real, pts.imag))
+
+def _discretize_subpaths(path, density):
+    """
+    Samples a path into a list of (N, 2) point arrays, one per continuous
+    subpath. continuous_subpaths() hands us the subpaths pre-split at Move
+    commands, so no per-segment discontinuity bookkeeping is needed.
+    """
+    subpaths = []
+
+    for subpath in path.continuous_subpaths():
+        chunks = []  # list of (N, 2) point arrays for this subpath
+
+        for segment in subpath:
+            length = segment_length_bound(segment)
+            if length < 1e-5:
+                continue
+
+            # Sample points along the segment; cubic Beziers get adaptive
+            # subdivision (flatness kept within sampling noise), everything
+            # else uniform arclength stepping
+            if isinstance(segment, CubicBezier):
+                xy = sample_cubic_adaptive(segment, density * 0.25)
+            else:
+                count = max(2, int(length / density))
+                xy = sample_segment(segment, count)
+
+            # Skip the start point if it continues the previous segment
+            if chunks:
+                xy = xy[1:]
+            chunks.append(xy)
+
+        if chunks:
+            points = np.concatenate(chunks)
+            if len(points) > 1:
+                # Round once per subpath; snaps near-coincident endpoints
+                # before noding without a per-sample Python round()
+                subpaths.append(np.round(points, 4, out=points))
+
+    return subpaths
+
+def sample_cubic_adaptive(segment, tol):
+    """
+    Adaptively samples a cubic Bezier by de Casteljau subdivision.
+
+    Subdivision halves every sub-curve whose inner control points deviate
+    more than tol from its chord, so straight runs emit few points and tight
+    corners emit many — far fewer samples than uniform arclength stepping for
+    the same accuracy. All active sub-curves are tested and split together as
+    one (M, 4, 2) array per round. Returns an (N, 2) array in curve order.
+    """
+    bp = np.asarray(segment.bpoints())
+    active = np.column_stack((bp.real, bp.imag)).reshape(1, 4, 2)
+    t0 = np.zeros(1)
+    dt = np.ones(1)
+
+    emitted_pts = []
+    emitted_t = []
+
+    for depth in range(MAX_SUBDIVISIONS):
+        chord = active[:, 3] - active[:, 0]
+        clen = np.linalg.norm(chord, axis=1)
+
+        # Perpendicular deviation of the inner control points from the chord;
+        # degenerate chords fall back to the raw control-point offsets
+        d1 = active[:, 1] - active[:, 0]
+        d2 = active[:, 2] - active[:, 3]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dev1 = np.abs(chord[:, 0] * d1[:, 1] - chord[:, 1] * d1[:, 0]) / clen
+            dev2 = np.abs(chord[:, 0] * d2[:, 1] - chord[:, 1] * d2[:, 0]) / clen
+        tiny = clen < 1e-9
+        dev1[tiny] = np.linalg.norm(d1[tiny], axis=1)
+        dev2[tiny] = np.linalg.norm(d2[tiny], axis=1)
+
+        flat = (dev1 < tol) & (dev2 < tol)
+        if depth == MAX_SUBDIVISIONS - 1:
+            flat[:] = True
+
+        if flat.any():
+            emitted_pts.append(active[flat, 0])
+            emitted_t.append(t0[flat])
+
+        keep = ~flat
+        if not keep.any():
+            break
+
+        p0, p1, p2, p3 = (active[keep, i] for i in range(4))
+        p01 = (p0 + p1) * 0.5
+        p12 = (p1 + p2) * 0.5
+        p23 = (p2 + p3) * 0.5
+        p012 = (p01 + p12) * 0.5
+        p123 = (p12 + p23) * 0.5
+        mid = (p012 + p123) * 0.5
+
+        half = dt[keep] * 0.5
+        active = np.concatenate([np.stack([p0, p01, p012, mid], axis=1),
+                                 np.stack([mid, p123, p23, p3], axis=1)])
+        t0 = np.concatenate([t0[keep], t0[keep] + half])
+        dt = np.concatenate([half, half])
+
+    points = np.concatenate(emitted_pts)
+    order = np.argsort(np.concatenate(emitted_t))
+    end = np.array([[segment.end.real, segment.end.imag]])
+    return np.concatenate([points[order], end])
+
+def segment_length_bound(segment):
+    """
+    Cheap upper bound on a segment's arclength, used to pick a sample count.
+    For Line/Bezier segments the control-polygon length bounds the curve
+    length, avoiding the adaptive quadrature behind CubicBezier.length();
+    arcs and other types fall back to their own length().
+    """
+    bpoints = getattr(segment, "bpoints", None)
+    if bpoints is not None:
+        return float(np.abs(np.diff(np.asarray(bpoints()))).sum())
+    return segment.length()
+
 def discretize_path(path, density):
     """
     Converts a complex path (Bezier curves, etc.) into a series of points (LineString).
     """
-    current_points = []
-    lines = []
-    
-    for segment in path:
-        # Check for discontinuity (Move command or separate subpaths)
-        if current_points:
-            last_p = complex(current_points[-1][0], current_points[-1][1])
-            # If start of new segment does not match end of previous, flush line
-            if abs(segment.start - last_p) > 1e-3:
-                if len(current_points) > 1:
-                    lines.append(LineString(current_points))
-                current_points = []
-        
-        length = segment.length()
-        if length < 1e-5:
-            continue
-        
-        # Sample points along the segment
-        count = max(2, int(length / density))
-        
-        # If start of new line, add start point
-        if not current_points:
-            p = segment.point(0)
-            current_points.append((round(p.real, 4), round(p.imag, 4)))
-
-        for i in range(1, count + 1):
-            t = i / count
-            p = segment.point(t)
-            current_points.append((round(p.real, 4), round(p.imag, 4)))
-    
-    # Flush path end
-    if len(current_points) > 1:
-        lines.append(LineString(current_points))
-        
-    return lines
+    return [LineString(points) for points in _discretize_subpaths(path, density)]
+
+def extend_tips(coords, indices, dist):
+    """
+    Extends the first and last vertex of every linestring along its first/last
+    edge by dist, operating in place on a flat coords/indices array pair.
+    Vectorized equivalent of calling extend_line on each geometry.
+    """
+    starts = np.unique(indices, return_index=True)[1]
+    ends = np.concatenate([starts[1:], [len(indices)]]) - 1
+
+    for tips, inner in ((starts, starts + 1), (ends, ends - 1)):
+        vec = coords[tips] - coords[inner]
+        norm = np.linalg.norm(vec, axis=1, keepdims=True)
+        ok = (norm > 1e-6).ravel()
+        coords[tips[ok]] += vec[ok] / norm[ok] * dist
+
+def build_linestrings(paths, density, extension=0.0):
+    """
+    Discretizes all paths and constructs one LineString per continuous subpath,
+    extending each subpath's tips by the given distance.
+
+    On Shapely 2.x the geometries are built in one shapely.linestrings() call
+    from a flat coordinate array plus an index array tagging each row with its
+    linestring id, avoiding a Python-level constructor per subpath. Returns a
+    numpy object array of LineStrings.
+    """
+    parts = []
+    if len(paths) >= MIN_PARALLEL_PATHS:
+        # Paths are independent and the vectorized point() evaluation spends
+        # its time in GIL-releasing numpy ufuncs, so threads give real overlap
+        # without process-pool pickling
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+            for subpaths in ex.map(_discretize_subpaths, paths, repeat(density)):
+                parts.extend(subpaths)
+    else:
+        for path in paths:
+            parts.extend(_discretize_subpaths(path, density))
+
+    if not parts:
+        return np.empty(0, dtype=object)
+
+    lengths = [len(p) for p in parts]
+    coords = np.concatenate(parts)
+    indices = np.repeat(np.arange(len(parts)), lengths)
+
+    if extension:
+        extend_tips(coords, indices, extension)
+
+    # Snap every vertex to a uniform grid in one pass so near-coincident
+    # endpoints around cut intersections collapse exactly — unary_union then
+    # avoids expensive near-miss splitting
+    np.round(coords / SNAP_GRID, out=coords)
+    coords *= SNAP_GRID
+
+    if _HAS_BULK_LINESTRINGS:
+        return shapely.linestrings(coords, indices=indices)
+
+    groups = np.split(coords, np.cumsum(lengths)[:-1])
+    return np.array([LineString(points) for points in groups], dtype=object)
@@ -1,12 +1,42 @@
+"""Tkinter front-end for generate_stl.py.
+
+Generator output is streamed into the log pane through one of two backends:
+on POSIX, Tk watches the subprocess stdout fd directly (createfilehandler)
+and no helper thread, queue or poll tick is involved; elsewhere a single
+worker thread reads chunks into a bounded queue drained by an adaptive
+after() loop. An asyncio.create_subprocess_exec loop thread was evaluated as
+a replacement for the fallback, but it would re-introduce a dedicated thread
+plus cross-thread handoff per chunk — exactly what the fd handler avoids —
+so the simpler thread+queue fallback stays.
+"""
+
+import codecs
+import concurrent.futures
 import os
 import queue
+import shlex
 import subprocess
 import sys
 import threading
 import tkinter as tk
+from dataclasses import dataclass
 from tkinter import filedialog, messagebox, ttk
 
 
+SCRIPT_PATH = os.path.join(os.path.dirname(__file__), "generate_stl.py")
+MAX_QUEUE_CHUNKS = 10000  # pending log chunks before the producer drops output
+MAX_LOG_LINES = 5000  # lines kept in the Text widget (ring-buffer style)
+
+
+@dataclass(slots=True)
+class GenerationParams:
+    input_file: str
+    output_file: str
+    thickness: float
+    tolerance: float
+    density: float
+
+
 class STLGeneratorUI(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -15,7 +45,25 @@ class STLGeneratorUI(tk.Tk):
         self.minsize(760, 500)
 
         self.process = None
-        self.log_queue = queue.Queue()
+        # SimpleQueue's put/get fast path is implemented in C; the chunk cap
+        # is enforced on the producer side since it has no maxsize
+        self.log_queue = queue.SimpleQueue()
+        # Tk on POSIX can watch the subprocess stdout fd directly; Windows
+        # Tcl builds lack createfilehandler and keep the thread+queue path
+        self._use_filehandler = hasattr(self.tk, "createfilehandler")
+        self._last_signature = None
+        self._last_validated = None
+        # One long-lived worker for the thread+queue fallback path instead of
+        # a fresh thread per generation; the stored future allows cancellation
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="stl-gen"
+        )
+        self._future = None
+        # Completion is control-plane state, not log data — an Event keeps it
+        # out of the queue so the drain loop never string-compares items
+        self._finished = threading.Event()
+        self._ui_running = False
+        self._last_dir = os.path.expanduser("~")
 
         self.input_var = tk.StringVar()
         self.output_var = tk.StringVar(value="jigsaw_pieces.stl")
@@ -25,7 +73,10 @@ class STLGeneratorUI(tk.Tk):
         self.status_var = tk.StringVar(value="Ready")
 
         self._build_layout()
-        self.after(100, self._drain_log_queue)
+        # The drain tick only serves the thread+queue fallback; on POSIX the
+        # fd handler delivers output directly and no polling runs at all
+        if not self._use_filehandler:
+            self.after(20, self._drain_log_queue)
         self.protocol("WM_DELETE_WINDOW", self._on_close)
 
     def _build_layout(self):
@@ -80,25 +131,54 @@ class STLGeneratorUI(tk.Tk):
         log_frame.rowconfigure(0, weight=1)
         log_frame.columnconfigure(0, weight=1)
 
-        self.log_text = tk.Text(log_frame, wrap="word", height=12, state="disabled")
+        # A log sink needs neither edit history nor word-wrap layout: undo
+        # snapshots are dead weight and wrapped-line layout is O(chars) per
+        # insert, so clip long lines and offer a horizontal scrollbar instead
+        self.log_text = tk.Text(
+            log_frame,
+            wrap="none",
+            height=12,
+            undo=False,
+            maxundo=0,
+            autoseparators=False,
+        )
+        # Read-only via input bindings rather than state="disabled", so
+        # appends don't need a pair of state toggles (two Tcl round-trips).
+        # The more specific Control-c binding wins over the blanket <Key>
+        # break and falls through to the class <<Copy>> handler, so selecting
+        # and copying log text keeps working
+        self.log_text.bind("<Key>", lambda e: "break")
+        self.log_text.bind("<Control-c>", lambda e: None)
+        self.log_text.bind("<<Paste>>", lambda e: "break")
+        # Appends address this mark instead of "end": marks resolve in O(1)
+        # on the Tcl side, string indices are re-parsed per call
+        self.log_text.mark_set("tail", "end")
+        self.log_text.mark_gravity("tail", "right")
         self.log_text.grid(row=0, column=0, sticky="nsew")
         scroll = ttk.Scrollbar(log_frame, orient="vertical", command=self.log_text.yview)
         scroll.grid(row=0, column=1, sticky="ns")
-        self.log_text.configure(yscrollcommand=scroll.set)
+        hscroll = ttk.Scrollbar(log_frame, orient="horizontal", command=self.log_text.xview)
+        hscroll.grid(row=1, column=0, sticky="ew")
+        self.log_text.configure(yscrollcommand=scroll.set, xscrollcommand=hscroll.set)
 
     def _append_log(self, line):
-        self.log_text.configure(state="normal")
-        self.log_text.insert("end", line)
-        self.log_text.see("end")
-        self.log_text.configure(state="disabled")
+        self.log_text.insert("tail", line)
+        # Trim from the top so a multi-megabyte log cannot make the widget
+        # sluggish or balloon memory
+        line_count = int(self.log_text.index("tail").split(".")[0])
+        if line_count > MAX_LOG_LINES:
+            self.log_text.delete("1.0", f"{line_count - MAX_LOG_LINES}.0")
+        self.log_text.see("tail")
 
     def _pick_input(self):
         path = filedialog.askopenfilename(
             title="Select SVG file",
+            initialdir=self._last_dir,
             filetypes=[("SVG files", "*.svg"), ("All files", "*.*")],
         )
         if not path:
             return
+        self._last_dir = os.path.dirname(path)
         self.input_var.set(path)
         if self.output_var.get().strip() == "jigsaw_pieces.stl":
             stem = os.path.splitext(os.path.basename(path))[0]
@@ -109,14 +189,27 @@ class STLGeneratorUI(tk.Tk):
         path = filedialog.asksaveasfilename(
             title="Save STL as",
             defaultextension=".stl",
+            initialdir=self._last_dir,
             filetypes=[("STL files", "*.stl"), ("All files", "*.*")],
             initialfile=os.path.basename(self.output_var.get().strip() or "jigsaw_pieces.stl"),
         )
         if path:
+            self._last_dir = os.path.dirname(path)
             self.output_var.set(path)
 
     def _validate_inputs(self):
-        input_file = self.input_var.get().strip()
+        # Repeated clicks without edits skip straight to the cached result
+        signature = (
+            self.input_var.get(),
+            self.output_var.get(),
+            self.thickness_var.get(),
+            self.tolerance_var.get(),
+            self.density_var.get(),
+        )
+        if signature == self._last_signature:
+            return self._last_validated
+
+        input_file = signature[0].strip()
         if not input_file:
             messagebox.showerror("Missing input", "Please choose an SVG input file.")
             return None
@@ -124,15 +217,15 @@ class STLGeneratorUI(tk.Tk):
             messagebox.showerror("Invalid input", "Selected SVG file does not exist.")
             return None
 
-        output_file = self.output_var.get().strip()
+        output_file = signature[1].strip()
         if not output_file:
             messagebox.showerror("Missing output", "Please provide an output STL file.")
             return None
 
         try:
-            thickness = float(self.thickness_var.get().strip())
-            tolerance = float(self.tolerance_var.get().strip())
-            density = float(self.density_var.get().strip())
+            thickness = float(signature[2].strip())
+            tolerance = float(signature[3].strip())
+            density = float(signature[4].strip())
         except ValueError:
             messagebox.showerror("Invalid values", "Thickness, tolerance, and density must be numbers.")
             return None
@@ -144,35 +237,94 @@ class STLGeneratorUI(tk.Tk):
             messagebox.showerror("Invalid density", "Density must be greater than 0.")
             return None
 
-        return input_file, output_file, thickness, tolerance, density
+        params = GenerationParams(input_file, output_file, thickness, tolerance, density)
+        self._last_signature = signature
+        self._last_validated = params
+        return params
 
     def _start_generation(self):
-        values = self._validate_inputs()
-        if not values:
+        params = self._validate_inputs()
+        if not params:
             return
 
-        input_file, output_file, thickness, tolerance, density = values
-        cmd = [
+        cmd = (
             sys.executable,
-            os.path.join(os.path.dirname(__file__), "generate_stl.py"),
-            input_file,
+            SCRIPT_PATH,
+            params.input_file,
             "-o",
-            output_file,
+            params.output_file,
             "--thickness",
-            str(thickness),
+            f"{params.thickness:g}",
             "--tolerance",
-            str(tolerance),
+            f"{params.tolerance:g}",
             "--density",
-            str(density),
-        ]
+            f"{params.density:g}",
+        )
 
-        self.generate_btn.configure(state="disabled")
-        self.status_var.set("Running...")
+        self._set_running(True)
         self._append_log("\n=== Starting generation ===\n")
-        self._append_log(" ".join(cmd) + "\n\n")
+        # shlex.join quotes paths with spaces, so the logged line is re-runnable
+        self._append_log(shlex.join(cmd) + "\n\n")
 
-        thread = threading.Thread(target=self._run_process, args=(cmd,), daemon=True)
-        thread.start()
+        if self._use_filehandler:
+            self._start_process_fd(cmd)
+        else:
+            self._future = self._executor.submit(self._run_process, cmd)
+
+    def _start_process_fd(self, cmd):
+        """POSIX path: let Tk watch the stdout fd instead of polling a queue."""
+        try:
+            self.process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=0,
+            )
+        except Exception as exc:
+            self._append_log(f"\nError while running generator: {exc}\n")
+            self._finish_generation()
+            return
+
+        # Chunk boundaries can split multi-byte characters, so decode
+        # incrementally instead of per-chunk
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        fd = self.process.stdout.fileno()
+        os.set_blocking(fd, False)
+        self.tk.createfilehandler(fd, tk.READABLE, self._on_stdout_ready)
+
+    def _on_stdout_ready(self, fd, mask):
+        while True:
+            try:
+                data = os.read(fd, 65536)
+            except BlockingIOError:
+                return
+            if not data:
+                # EOF — the generator exited
+                self.tk.deletefilehandler(fd)
+                tail = self._decoder.decode(b"", final=True)
+                if tail:
+                    self._append_log(tail)
+                return_code = self.process.wait()
+                if return_code == 0:
+                    self._append_log("\nGeneration completed successfully.\n")
+                else:
+                    self._append_log(f"\nGeneration failed with exit code {return_code}.\n")
+                self.process = None
+                self._finish_generation()
+                return
+            self._append_log(self._decoder.decode(data))
+
+    def _finish_generation(self):
+        self._set_running(False)
+
+    def _set_running(self, running):
+        # Only touch the StringVar/button on actual transitions — each set()
+        # fires Tk trace callbacks even when the value is unchanged
+        if running == self._ui_running:
+            return
+        self._ui_running = running
+        self.generate_btn.configure(state="disabled" if running else "normal")
+        self.status_var.set("Running..." if running else "Ready")
 
     def _run_process(self, cmd):
         try:
@@ -180,12 +332,27 @@ class STLGeneratorUI(tk.Tk):
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
+                # Unbuffered: the worker reads the raw fd itself below
+                bufsize=0,
             )
             assert self.process.stdout is not None
-            for line in self.process.stdout:
-                self.log_queue.put(line)
+            # The log pane is a pure display sink, so pull 64 KiB chunks
+            # straight off the pipe fd — os.read releases the GIL while
+            # blocked, leaving the Tk thread free to run. When the generator
+            # outpaces the UI, drop chunks rather than queueing without
+            # bound, and mark the gap.
+            fd = self.process.stdout.fileno()
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            dropped = False
+            while data := os.read(fd, 65536):
+                text_chunk = decoder.decode(data)
+                if self.log_queue.qsize() >= MAX_QUEUE_CHUNKS:
+                    dropped = True
+                    continue
+                if dropped:
+                    text_chunk = "\n... (log truncated) ...\n" + text_chunk
+                    dropped = False
+                self.log_queue.put(text_chunk)
             return_code = self.process.wait()
             if return_code == 0:
                 self.log_queue.put("\nGeneration completed successfully.\n")
@@ -194,21 +361,28 @@ class STLGeneratorUI(tk.Tk):
         except Exception as exc:
             self.log_queue.put(f"\nError while running generator: {exc}\n")
         finally:
-            self.log_queue.put("__PROCESS_FINISHED__")
+            self._finished.set()
             self.process = None
 
     def _drain_log_queue(self):
+        # Pull everything queued since the last tick and insert it as a single
+        # batch — one state toggle / insert / scroll instead of one per line
+        lines = []
         try:
             while True:
-                item = self.log_queue.get_nowait()
-                if item == "__PROCESS_FINISHED__":
-                    self.generate_btn.configure(state="normal")
-                    self.status_var.set("Ready")
-                else:
-                    self._append_log(item)
+                lines.append(self.log_queue.get_nowait())
         except queue.Empty:
             pass
-        self.after(100, self._drain_log_queue)
+
+        if lines:
+            self._append_log("".join(lines))
+        if self._finished.is_set() and self.log_queue.empty():
+            self._finished.clear()
+            self._finish_generation()
+
+        # Adaptive poll: re-check almost immediately while output is flowing,
+        # back off when the queue came up empty
+        self.after(1 if lines else 50, self._drain_log_queue)
 
     def _on_close(self):
         if self.process and self.process.poll() is None:
@@ -217,6 +391,7 @@ class STLGeneratorUI(tk.Tk):
             ):
                 return
             self.process.terminate()
+        self._executor.shutdown(wait=False, cancel_futures=True)
         self.destroy()
 
 